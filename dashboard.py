@@ -5,10 +5,14 @@ A dashboard to monitor and execute ETL pipelines
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
+import pyarrow as pa
+import uuid
 from datetime import datetime
-from etl_pipeline import ETLPipeline
+from etl_pipeline import ETLPipeline, m4_downsample, write_csv
 
 # Page configuration
 st.set_page_config(
@@ -23,6 +27,122 @@ if 'etl_pipeline' not in st.session_state:
     st.session_state.etl_pipeline = ETLPipeline()
 if 'pipeline_run' not in st.session_state:
     st.session_state.pipeline_run = False
+if 'run_key' not in st.session_state:
+    st.session_state.run_key = None
+
+
+# Cached helpers - keyed on the run_key of the pipeline run that produced
+# the frame; the frame itself is passed unhashed
+@st.cache_data(max_entries=32, show_spinner=False)
+def filter_data(_df, run_key, region, product):
+    """Rows of the transformed data matching the selected filters"""
+    mask = np.ones(len(_df), dtype=bool)
+    
+    if region != 'All':
+        mask &= _df['region'].values == region
+    
+    if product != 'All':
+        mask &= _df['product_name'].values == product
+    
+    return _df[mask]
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def filtered_csv(_df, run_key, region, product):
+    """CSV export of the filtered data, encoded by PyArrow's native writer"""
+    buf = pa.BufferOutputStream()
+    write_csv(filter_data(_df, run_key, region, product), buf)
+    return buf.getvalue().to_pybytes()
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def describe_data(_df, run_key, region, product):
+    """Column statistics of the filtered data"""
+    return filter_data(_df, run_key, region, product).describe()
+
+
+# Shared chart styling, built once on top of Plotly's default template
+CHART_TEMPLATE = pio.templates.merge_templates(
+    'plotly',
+    go.layout.Template(layout=dict(font=dict(size=12), margin=dict(l=40, r=10, t=40, b=40)))
+)
+
+
+# Analytics figures - built once per pipeline run and shared as resources
+@st.cache_resource(max_entries=32, show_spinner=False)
+def region_figure(_agg, run_key):
+    """Revenue distribution by region"""
+    return px.pie(
+        _agg,
+        values='revenue',
+        names='region',
+        title='Revenue Distribution by Region',
+        hole=0.4,
+        template=CHART_TEMPLATE
+    )
+
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def price_category_figure(_agg, run_key):
+    """Revenue by price category"""
+    return px.bar(
+        _agg,
+        x='price_category',
+        y='revenue',
+        title='Revenue by Price Category',
+        color='revenue',
+        color_continuous_scale='blues',
+        template=CHART_TEMPLATE
+    )
+
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def daily_revenue_figure(_agg, run_key):
+    """Daily revenue trend, downsampled to what a chart can draw"""
+    dates, revenue = m4_downsample(_agg['date'].values.astype('i8'), _agg['revenue'].values)
+    fig = px.line(
+        pd.DataFrame({'date': pd.to_datetime(dates), 'revenue': revenue}),
+        x='date',
+        y='revenue',
+        title='Daily Revenue Trend',
+        markers=True,
+        template=CHART_TEMPLATE
+    )
+    fig.update_layout(
+        xaxis_title="Date",
+        yaxis_title="Revenue ($)",
+        hovermode='x unified'
+    )
+    return fig
+
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def top_products_figure(_agg, run_key):
+    """Top products by revenue"""
+    return px.bar(
+        x=_agg.values,
+        y=_agg.index,
+        orientation='h',
+        title='Top 10 Products',
+        labels={'x': 'Revenue ($)', 'y': 'Product'},
+        template=CHART_TEMPLATE
+    )
+
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def quarter_figure(_agg, run_key):
+    """Revenue by quarter"""
+    quarter_revenue = _agg.assign(quarter='Q' + _agg['quarter'].astype(str))
+    return px.bar(
+        quarter_revenue,
+        x='quarter',
+        y='revenue',
+        title='Quarterly Revenue',
+        color='revenue',
+        color_continuous_scale='viridis',
+        template=CHART_TEMPLATE
+    )
+
 
 # Custom CSS
 st.markdown("""
@@ -61,7 +181,7 @@ with st.sidebar:
     st.subheader("Load Destination")
     destination = st.selectbox(
         "Select Destination",
-        ["memory", "csv"],
+        ["memory", "csv", "parquet"],
         help="Choose where to load the transformed data"
     )
     
@@ -69,15 +189,27 @@ with st.sidebar:
     
     # Run Pipeline Button
     if st.button("▶️ Run ETL Pipeline", type="primary", use_container_width=True):
-        with st.spinner("Running ETL Pipeline..."):
-            st.session_state.etl_pipeline = ETLPipeline()
-            success = st.session_state.etl_pipeline.run_full_pipeline(source_type, destination)
-            st.session_state.pipeline_run = True
-            
-            if success:
-                st.success("✅ Pipeline completed successfully!")
-            else:
-                st.error("❌ Pipeline failed!")
+        progress = st.progress(0, text="Running ETL Pipeline...")
+        pipeline_stages = ["Extract", "Transform", "Load"]
+        
+        def update_progress(stage, elapsed):
+            done = pipeline_stages.index(stage) + 1
+            progress.progress(
+                done / len(pipeline_stages),
+                text=f"{stage} complete ({elapsed * 1000:.0f} ms)"
+            )
+        
+        st.session_state.etl_pipeline = ETLPipeline()
+        success = st.session_state.etl_pipeline.run_full_pipeline(
+            source_type, destination, on_stage_complete=update_progress
+        )
+        st.session_state.pipeline_run = True
+        st.session_state.run_key = uuid.uuid4().hex
+        
+        if success:
+            st.success("✅ Pipeline completed successfully!")
+        else:
+            st.error("❌ Pipeline failed!")
     
     # Reset Button
     if st.button("🔄 Reset Pipeline", use_container_width=True):
@@ -182,81 +314,36 @@ else:
         st.header("Data Analytics")
         
         if etl.transformed_data is not None:
-            df = etl.transformed_data
-            
             # Revenue by Region
             col1, col2 = st.columns(2)
             
             with col1:
                 st.subheader("Revenue by Region")
-                region_revenue = df.groupby('region')['revenue'].sum().reset_index()
-                fig = px.pie(
-                    region_revenue,
-                    values='revenue',
-                    names='region',
-                    title='Revenue Distribution by Region',
-                    hole=0.4
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                fig = region_figure(etl.agg_region, st.session_state.run_key)
+                st.plotly_chart(fig, use_container_width=True, theme=None)
             
             with col2:
                 st.subheader("Revenue by Price Category")
-                price_cat_revenue = df.groupby('price_category')['revenue'].sum().reset_index()
-                fig = px.bar(
-                    price_cat_revenue,
-                    x='price_category',
-                    y='revenue',
-                    title='Revenue by Price Category',
-                    color='revenue',
-                    color_continuous_scale='blues'
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                fig = price_category_figure(etl.agg_price_category, st.session_state.run_key)
+                st.plotly_chart(fig, use_container_width=True, theme=None)
             
             # Time series
             st.subheader("Revenue Over Time")
-            daily_revenue = df.groupby('date')['revenue'].sum().reset_index()
-            fig = px.line(
-                daily_revenue,
-                x='date',
-                y='revenue',
-                title='Daily Revenue Trend',
-                markers=True
-            )
-            fig.update_layout(
-                xaxis_title="Date",
-                yaxis_title="Revenue ($)",
-                hovermode='x unified'
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            fig = daily_revenue_figure(etl.agg_daily, st.session_state.run_key)
+            st.plotly_chart(fig, use_container_width=True, theme=None)
             
             # Top products
             col1, col2 = st.columns(2)
             
             with col1:
                 st.subheader("Top 10 Products by Revenue")
-                top_products = df.groupby('product_name')['revenue'].sum().sort_values(ascending=False).head(10)
-                fig = px.bar(
-                    x=top_products.values,
-                    y=top_products.index,
-                    orientation='h',
-                    title='Top 10 Products',
-                    labels={'x': 'Revenue ($)', 'y': 'Product'}
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                fig = top_products_figure(etl.agg_top_products, st.session_state.run_key)
+                st.plotly_chart(fig, use_container_width=True, theme=None)
             
             with col2:
                 st.subheader("Revenue by Quarter")
-                quarter_revenue = df.groupby('quarter')['revenue'].sum().reset_index()
-                quarter_revenue['quarter'] = 'Q' + quarter_revenue['quarter'].astype(str)
-                fig = px.bar(
-                    quarter_revenue,
-                    x='quarter',
-                    y='revenue',
-                    title='Quarterly Revenue',
-                    color='revenue',
-                    color_continuous_scale='viridis'
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                fig = quarter_figure(etl.agg_quarter, st.session_state.run_key)
+                st.plotly_chart(fig, use_container_width=True, theme=None)
     
     with tab3:
         st.header("Data Preview")
@@ -268,24 +355,19 @@ else:
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                regions = ['All'] + sorted(etl.transformed_data['region'].unique().tolist())
+                regions = ['All'] + etl.transformed_data['region'].cat.categories.tolist()
                 selected_region = st.selectbox("Filter by Region", regions)
             
             with col2:
-                products = ['All'] + sorted(etl.transformed_data['product_name'].unique().tolist())
+                products = ['All'] + etl.transformed_data['product_name'].cat.categories.tolist()
                 selected_product = st.selectbox("Filter by Product", products)
             
             with col3:
                 show_rows = st.slider("Rows to display", 10, 100, 50)
             
             # Apply filters
-            filtered_df = etl.transformed_data.copy()
-            
-            if selected_region != 'All':
-                filtered_df = filtered_df[filtered_df['region'] == selected_region]
-            
-            if selected_product != 'All':
-                filtered_df = filtered_df[filtered_df['product_name'] == selected_product]
+            filter_key = (etl.transformed_data, st.session_state.run_key, selected_region, selected_product)
+            filtered_df = filter_data(*filter_key)
             
             st.dataframe(
                 filtered_df.head(show_rows),
@@ -294,7 +376,7 @@ else:
             )
             
             # Download button
-            csv = filtered_df.to_csv(index=False)
+            csv = filtered_csv(*filter_key)
             st.download_button(
                 label="📥 Download Filtered Data as CSV",
                 data=csv,
@@ -305,7 +387,7 @@ else:
             # Data Statistics
             st.subheader("Column Statistics")
             st.dataframe(
-                filtered_df.describe(),
+                describe_data(*filter_key),
                 use_container_width=True
             )
     
@@ -314,7 +396,7 @@ else:
         
         if etl.logs:
             # Display logs in a code block
-            st.code('\n'.join(etl.logs), language='log')
+            st.code(etl.rendered_logs, language='log')
         else:
             st.info("No logs available. Run the pipeline to see execution logs.")
 